@@ -1,10 +1,18 @@
-import io
-import json
+import mmap
+import sys
 from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
 from uuid import uuid4
 
+from .common import executor, json_loads
+from .exceptions import InvalidInputException, ProcessingAborted
+
 
 class AbstractProcessor(ABC):
+    __slots__ = ('_trace_id', '_data')
+
     def __init__(self, trace_id, layer_data):
         # Assign a trace id for distributed tracing and for facilitating rollback (in the event of a failure)
         self._trace_id = trace_id
@@ -39,6 +47,7 @@ class AbstractStrategy(ABC):
     """
     This interface (abstract class in Python) contains method defs that should be implemented by any strategy
     """
+    __slots__ = ()
 
     @abstractmethod
     def validate(self):
@@ -109,9 +118,8 @@ class AbstractNotifier(ABC):
 
 
 class NullNotifier(AbstractNotifier):
-    def notify(self):
-        # No action is needed
-        pass
+    # No action is needed. Left unset rather than a no-op method, so that callers can skip the call altogether
+    notify = None
 
 
 class EmailNotifier(AbstractNotifier):
@@ -131,6 +139,7 @@ class AbstractStorage(ABC):
 
     @abstractmethod
     def remove(self):
+        pass
 
 
 class StoreToS3(AbstractStorage):
@@ -145,39 +154,57 @@ class StoreToDB(AbstractStorage):
     pass
 
 
+# Transformer, notifier and storage configured per field name. Any other field name falls back to the defaults
+_TRANSFORMER_MAP = {'address': RuleBasedTransformer, 'transaction': RuleBasedTransformer}
+_NOTIFIER_MAP = {'address': EmailNotifier, 'location': MessageQueueNotifier, 'transaction': MessageQueueNotifier}
+_STORAGE_MAP = {'address': StoreToS3, 'location': StoreToDB, 'transaction': StoreToDB}
+
+
 class TransformerFactory(object):
     @staticmethod
-    def get_transformer(data):
-        if data.field_name in ('address', 'transaction'):
-            return RuleBasedTransformer
-        else:
-            return ReflectiveTransformer
+    def get_transformer(field_name):
+        return _TRANSFORMER_MAP.get(field_name, ReflectiveTransformer)
 
 
 class NotifierFactory(object):
     @staticmethod
-    def get_notifier(data):
-        if data.field_name in ('address',):
-            return EmailNotifier
-        elif data.field_name in ('location', 'transaction'):
-            return MessageQueueNotifier
-        else:
-            return NullNotifier
+    def get_notifier(field_name):
+        return _NOTIFIER_MAP.get(field_name, NullNotifier)
 
 
 class StorageFactory(object):
     @staticmethod
-    def get_storage(data):
-        if data.field_name in ('address',):
-            return StoreToS3
-        elif data.field_name in ('location', 'transaction'):
-            return StoreToDB
-        else:
-            return StoreToFile
+    def get_storage(field_name):
+        return _STORAGE_MAP.get(field_name, StoreToFile)
+
+
+def _get_handler_classes(field_name):
+    return (TransformerFactory.get_transformer(field_name),
+            StorageFactory.get_storage(field_name),
+            NotifierFactory.get_notifier(field_name))
+
+
+# (transformer, storage, notifier) classes per field name, so that a strategy resolves all three with one lookup
+_DISPATCH = {
+    field_name: _get_handler_classes(field_name)
+    for field_name in _TRANSFORMER_MAP.keys() | _NOTIFIER_MAP.keys() | _STORAGE_MAP.keys()
+}
+
+
+def _resolve_handlers(field_name):
+    """
+    Builds the transformer, storage handler and notifier configured for the field name
+    :param field_name:
+    :return: (transformer, storage handler, notifier) instances
+    """
+    handler_classes = _DISPATCH.get(field_name) or _get_handler_classes(field_name)
+    return tuple(handler_cls() for handler_cls in handler_classes)
 
 
 class ConcreteStrategy(AbstractStrategy):
-    def __init__(self, data, stop_on_failure=True, is_independent_of_children=False):
+    __slots__ = ('is_independent_of_children', 'stop_on_failure', 'transformer', 'storage_handler', 'notifier_obj')
+
+    def __init__(self, field_name, stop_on_failure=True, is_independent_of_children=False):
         # This attribute defines whether the current level / layer can be processed independently without having
         # to process the nested levels.
         self.is_independent_of_children = is_independent_of_children
@@ -185,68 +212,115 @@ class ConcreteStrategy(AbstractStrategy):
         # Let the processor decide whether the data parsing should be stopped (and other changes should be
         # reverted back in the event of a failure)
         self.stop_on_failure = stop_on_failure
-        self.transformer = TransformerFactory.get_transformer(data)()
-        self.storage_handler = StorageFactory.get_storage(data)()
-        self.notifier_obj = NotifierFactory.get_notifier(data)()
+        self.transformer, self.storage_handler, self.notifier_obj = _resolve_handlers(field_name)
 
     def validate(self):
         self.transformer.validate()
 
     def process(self):
         self.transformer.transform()
-        self.notifier_obj.notify()
+        notify = self.notifier_obj.notify
+        if notify is not None:
+            notify()
 
     def store(self):
         self.storage_handler.store()
 
 
+@lru_cache(maxsize=None)
+def _get_shared_strategy(field_name):
+    return ConcreteStrategy(field_name)
+
+
+def _get_strategy(field_name):
+    """
+    A strategy and its handlers hold no per-layer state, hence the layers with the same field name share one strategy.
+    Field names come from the input, so the ones without a configuration share the default strategy. That keeps the
+    cache bound to the configured field names.
+    :param field_name:
+    :return: ConcreteStrategy for the field name
+    """
+    return _get_shared_strategy(field_name if field_name in _DISPATCH else None)
+
+
 class ConcreteProcessor(AbstractProcessor):
+    __slots__ = ('strategy',)
 
-    def __init__(self, trace_id, layer_data):
+    def __init__(self, trace_id, layer_data, strategy=None):
         super().__init__(trace_id=trace_id, layer_data=layer_data)
-        self.strategy = ConcreteStrategy(layer_data)
+        # The walk resolves the strategy of a layer ahead of its processor and hands it over
+        if strategy is None:
+            strategy = _get_strategy(layer_data.field_name)
+        self.strategy = strategy
 
     def _process(self):
-        layer_nodes = []
-        # Process data fields
-
+        """
+        Walks the layers below the current one breadth first. A layer that is independent of its children is handed
+        over to the executor, the remaining layers are walked inline.
+        :return: futures of the layers handed over to the executor
+        """
+        futures = []
         # Capture node fields and queue it up for processing
-        for field, value in self._data.items():
-            if type(value) is dict:
-                layer_nodes.append(value)
-
-        processor_obj = None
-        for layer_node in layer_nodes:
+        layer_queue = deque(value for value in self._data.values() if isinstance(value, dict))
+        # Bound to locals as they are looked up once per layer
+        processor_cls, get_strategy, submit = ConcreteProcessor, _get_strategy, executor.submit
+        trace_id, enqueue_all, add_future = self._trace_id, layer_queue.extend, futures.append
+        while layer_queue:
+            layer_node = layer_queue.popleft()
+            # Resolved ahead of the processor, so that a failure is handled as configured for the layer that caused it
+            try:
+                strategy = get_strategy(layer_node.field_name)
+            except InvalidInputException:
+                # Without a strategy there is no stop_on_failure to consult, hence the processing is aborted
+                raise ProcessingAborted(trace_id=trace_id)
             try:
-                processor_obj = ConcreteProcessor(self._trace_id, layer_node)
-                if processor_obj.strategy.is_independent_of_children:
-                    # Process the data in async fashion with a callback / future
-                    # The callback ensures the completion
-                    pass
-                processor_obj.process_data()
+                processor_obj = processor_cls(trace_id, layer_node, strategy)
+                if strategy.is_independent_of_children:
+                    # Process the data in async fashion, the future ensures the completion
+                    add_future(submit(processor_obj._process))
+                else:
+                    enqueue_all(value for value in layer_node.values() if isinstance(value, dict))
             except InvalidInputException:
-                if processor_obj.strategy_obj.stop_on_failure:
-                    processor_obj.notify()
-                    exit(-1)
+                if strategy.stop_on_failure:
+                    raise ProcessingAborted(trace_id=trace_id)
+        return futures
+
+    def process_data(self):
+        # Layers running on the executor return the futures of their own independent sub-layers instead of waiting
+        # on them, so a worker never blocks on the pool it runs in. All of them are joined here, in any order as the
+        # layers are independent of one another.
+        futures = self._process()
+        while futures:
+            futures.extend(futures.pop().result())
 
 
 class Driver(object):
+    @contextmanager
     def get_content_from_file(self, file_path):
         """
-        Reading the entire file as the maximum file size would be only 15 MB.
-        On my laptop (16 GB RAM) reading a 24 MB file took only took ~ 1 second
+        Memory-maps the file rather than reading it, so the parser works off the page cache directly. The OS pages
+        the content in on demand and no copy of the file is held in the process heap while orjson parses it.
+        The stdlib fallback parser only accepts bytes, so without orjson `bytes(content)` copies the whole file anyway.
+        The view is valid only while the file is mapped, hence this is a context manager rather than a method
+        returning the content.
         :param file_path:
-        :return:
+        :return: read-only view over the file content, valid until the context exits
         """
-        with open(file_path, 'r') as file_obj:
-            fi = io.FileIO(file_obj.fileno())
-            fo = io.BufferedReader(fi)
-            content = fo.read()
-            return content
+        with open(file_path, 'rb', buffering=0) as file_obj, \
+                mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file, \
+                memoryview(mapped_file) as content:
+            yield content
 
     def main(self, file_path):
-        content = self.get_content_from_file(file_path)
-        layer_data = json.loads(content)
+        with self.get_content_from_file(file_path) as content:
+            layer_data = json_loads(content)
         trace_id = uuid4()
         processor_obj = ConcreteProcessor(trace_id=trace_id, layer_data=layer_data)
-        processor_obj.process_data()
+        try:
+            processor_obj.process_data()
+        except ProcessingAborted:
+            # The failed layer may not have a processor of its own, hence the abort is notified for the whole file
+            processor_obj._notify()
+            # Layers that haven't started yet are dropped, the ones in flight are allowed to finish
+            executor.shutdown(cancel_futures=True)
+            sys.exit(1)
@@ -0,0 +1,16 @@
+class InvalidInputException(Exception):
+    """
+    Raised by a strategy when a layer fails validation
+    """
+    pass
+
+
+class ProcessingAborted(Exception):
+    """
+    Raised when a layer fails and its strategy asks for the processing of the entire file to be stopped.
+    The trace id allows the changes made so far to be rolled back.
+    """
+
+    def __init__(self, trace_id):
+        super().__init__(f"Processing aborted for trace id {trace_id}")
+        self.trace_id = trace_id
@@ -1,10 +1,17 @@
-import io
-import json
+import mmap
+import sys
 from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
 from uuid import uuid4
 
+from .common import executor, json_loads
+from .exceptions import InvalidInputException, ProcessingAborted
+
 
 class AbstractProcessor(ABC):
+    __slots__ = ('_trace_id', '_data')
+
     def __init__(self, trace_id, layer_data):
         # Assign a trace id for distributed tracing and for facilitating rollback (in the event of a failure)
         self._trace_id = trace_id
@@ -118,6 +125,8 @@ class AvenueAddressStrategy(BaseAddressStrategy):
 
 
 class AddressProcessor(AbstractProcessor):
+    __slots__ = ('strategy',)
+
     def __init__(self, trace_id, layer_data):
         super().__init__(trace_id=trace_id, layer_data=layer_data)
         self.strategy = StrategyResolver.get_strategy(layer_data.field_name, layer_data.data)
@@ -142,52 +151,83 @@ class StrategyResolver(object):
 
 
 class ConcreteProcessor(AbstractProcessor):
+    __slots__ = ('strategy_obj',)
 
-    def __init__(self, trace_id, layer_data):
+    def __init__(self, trace_id, layer_data, strategy_obj=None):
         super().__init__(trace_id=trace_id, layer_data=layer_data)
-        self.strategy_obj = StrategyResolver.get_strategy(layer_data.field_name, layer_data.data)
+        # The walk resolves the strategy of a layer ahead of its processor and hands it over
+        if strategy_obj is None:
+            strategy_obj = StrategyResolver.get_strategy(layer_data.field_name, layer_data.data)
+        self.strategy_obj = strategy_obj
 
     def _process(self):
-        layer_nodes = []
-        # Process data fields
-
+        """
+        Walks the layers below the current one breadth first. A layer that is independent of its children is handed
+        over to the executor, the remaining layers are walked inline.
+        :return: futures of the layers handed over to the executor
+        """
+        futures = []
         # Capture node fields and queue it up for processing
-        for field, value in self._data.items():
-            if type(value) is dict:
-                layer_nodes.append(value)
-
-        processor_obj = None
-        for layer_node in layer_nodes:
+        layer_queue = deque(value for value in self._data.values() if isinstance(value, dict))
+        # Bound to locals as they are looked up once per layer
+        processor_cls, get_strategy, submit = ConcreteProcessor, StrategyResolver.get_strategy, executor.submit
+        trace_id, enqueue_all, add_future = self._trace_id, layer_queue.extend, futures.append
+        while layer_queue:
+            layer_node = layer_queue.popleft()
+            # Resolved ahead of the processor, so that a failure is handled as configured for the layer that caused it
+            try:
+                strategy = get_strategy(layer_node.field_name, layer_node.data)
+            except InvalidInputException:
+                # Without a strategy there is no stop_on_failure to consult, hence the processing is aborted
+                raise ProcessingAborted(trace_id=trace_id)
             try:
-                processor_obj = ConcreteProcessor(self._trace_id, layer_node)
-                if processor_obj.strategy_obj.is_independent_of_children:
-                    # Process the data in async fashion with a callback / future
-                    # The callback ensures the completion
-                    pass
-                processor_obj.process_data()
+                processor_obj = processor_cls(trace_id, layer_node, strategy)
+                if strategy.is_independent_of_children:
+                    # Process the data in async fashion, the future ensures the completion
+                    add_future(submit(processor_obj._process))
+                else:
+                    enqueue_all(value for value in layer_node.values() if isinstance(value, dict))
             except InvalidInputException:
-                if processor_obj.strategy_obj.stop_on_failure:
-                    processor_obj.notify()
-                    exit(-1)
+                if strategy.stop_on_failure:
+                    raise ProcessingAborted(trace_id=trace_id)
+        return futures
+
+    def process_data(self):
+        # Layers running on the executor return the futures of their own independent sub-layers instead of waiting
+        # on them, so a worker never blocks on the pool it runs in. All of them are joined here, in any order as the
+        # layers are independent of one another.
+        futures = self._process()
+        while futures:
+            futures.extend(futures.pop().result())
 
 
 class Driver(object):
+    @contextmanager
     def get_content_from_file(self, file_path):
         """
-        Reading the entire file as the maximum file size would be only 15 MB.
-        On my laptop (16 GB RAM) reading a 24 MB file took only took ~ 1 second
+        Memory-maps the file rather than reading it, so the parser works off the page cache directly. The OS pages
+        the content in on demand and no copy of the file is held in the process heap while orjson parses it.
+        The stdlib fallback parser only accepts bytes, so without orjson `bytes(content)` copies the whole file anyway.
+        The view is valid only while the file is mapped, hence this is a context manager rather than a method
+        returning the content.
         :param file_path:
-        :return:
+        :return: read-only view over the file content, valid until the context exits
         """
-        with open(file_path, 'r') as file_obj:
-            fi = io.FileIO(file_obj.fileno())
-            fo = io.BufferedReader(fi)
-            content = fo.read()
-            return content
+        with open(file_path, 'rb', buffering=0) as file_obj, \
+                mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file, \
+                memoryview(mapped_file) as content:
+            yield content
 
     def main(self, file_path):
-        content = self.get_content_from_file(file_path)
-        layer_data = json.loads(content)
+        with self.get_content_from_file(file_path) as content:
+            layer_data = json_loads(content)
         trace_id = uuid4()
         processor_obj = ConcreteProcessor(trace_id=trace_id, layer_data=layer_data)
-        processor_obj.process_data()
+        try:
+            processor_obj.process_data()
+        except ProcessingAborted:
+            # The failed layer may not have a processor of its own, hence the abort is notified for the whole file
+            processor_obj._notify()
+            # Layers that haven't started yet are dropped, the ones in flight are allowed to finish
+            executor.shutdown(cancel_futures=True)
+            sys.exit(1)
@@ -0,0 +1,171 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+from dataprocessor import configuration_based_strategy, one_strategy_per_layer_type
+from dataprocessor.exceptions import InvalidInputException, ProcessingAborted
+
+
+class Layer(dict):
+    """
+    A layer as the processors expect it - a dict that also carries its field name
+    """
+
+    def __init__(self, field_name, fields=()):
+        super().__init__(fields)
+        self.field_name = field_name
+
+    @property
+    def data(self):
+        return self
+
+
+def layer(field_name, **fields):
+    return Layer(field_name, fields)
+
+
+def to_layer(value):
+    if isinstance(value, dict):
+        return Layer(value['field_name'], {key: to_layer(item) for key, item in value.items()})
+    return value
+
+
+class FailurePathTestMixin(object):
+    """
+    Runs the walk of a template's ConcreteProcessor against stub strategies. The templates leave _undo_process and the
+    handlers unimplemented, so the processor is subclassed to make it concrete and to fail on layers marked 'invalid'.
+    """
+    module = None
+
+    def patch_resolver(self, resolver):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.processed = []
+        self.notified = []
+        self.strategies = {}
+        self.resolved = []
+        processed, notified = self.processed, self.notified
+
+        class StubProcessor(self.module.ConcreteProcessor):
+            __slots__ = ()
+
+            def __init__(self, trace_id, layer_data, *args):
+                if layer_data.get('invalid'):
+                    raise InvalidInputException()
+                super().__init__(trace_id, layer_data, *args)
+                processed.append((layer_data.field_name, threading.current_thread() is threading.main_thread()))
+
+            def _notify(self):
+                notified.append(self._data.field_name)
+
+            def _undo_process(self):
+                pass
+
+        self.processor_cls = StubProcessor
+        for patcher in (mock.patch.object(self.module, 'ConcreteProcessor', StubProcessor),
+                        self.patch_resolver(self.resolve_strategy)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def resolve_strategy(self, field_name, data=None):
+        self.resolved.append(field_name)
+        strategy = self.strategies[field_name]
+        if strategy is None:
+            raise InvalidInputException()
+        return strategy
+
+    def add_strategy(self, field_name, stop_on_failure=True, is_independent_of_children=False):
+        self.strategies[field_name] = SimpleNamespace(stop_on_failure=stop_on_failure,
+                                                      is_independent_of_children=is_independent_of_children)
+
+    def process(self, root):
+        self.processor_cls('trace', root).process_data()
+
+    def test_failing_first_child_aborts(self):
+        for field_name in ('root', 'first', 'second'):
+            self.add_strategy(field_name)
+        root = layer('root', first=layer('first', invalid=True), second=layer('second'))
+
+        with self.assertRaises(ProcessingAborted) as context:
+            self.process(root)
+        self.assertEqual(context.exception.trace_id, 'trace')
+
+    def test_failing_child_is_judged_by_its_own_strategy(self):
+        self.add_strategy('root')
+        self.add_strategy('first')
+        self.add_strategy('second', stop_on_failure=False)
+        self.add_strategy('nested')
+        root = layer('root', first=layer('first'), second=layer('second', invalid=True, nested=layer('nested')))
+
+        self.process(root)
+        # The sub-layers of the failed layer are skipped, the rest of the file is processed
+        self.assertEqual([field_name for field_name, _ in self.processed], ['root', 'first'])
+
+    def test_failure_on_a_worker_aborts(self):
+        self.add_strategy('root')
+        self.add_strategy('independent', is_independent_of_children=True)
+        self.add_strategy('nested')
+        root = layer('root', independent=layer('independent', nested=layer('nested', invalid=True)))
+
+        with self.assertRaises(ProcessingAborted) as context:
+            self.process(root)
+        self.assertEqual(context.exception.trace_id, 'trace')
+
+    def test_independent_layers_are_processed_on_the_executor(self):
+        self.add_strategy('root')
+        self.add_strategy('independent', is_independent_of_children=True)
+        self.add_strategy('nested')
+        root = layer('root', independent=layer('independent', nested=layer('nested')))
+
+        self.process(root)
+        self.assertEqual(self.processed, [('root', True), ('independent', True), ('nested', False)])
+        # Once per layer - the walk hands the strategy over to the processor rather than having it resolved again
+        self.assertEqual(sorted(self.resolved), ['independent', 'nested', 'root'])
+
+    def test_failing_strategy_resolution_aborts(self):
+        self.add_strategy('root', stop_on_failure=False)
+        self.strategies['unresolved'] = None
+        root = layer('root', unresolved=layer('unresolved'))
+
+        with self.assertRaises(ProcessingAborted):
+            self.process(root)
+
+    def test_driver_exits_on_abort(self):
+        self.add_strategy('root')
+        self.add_strategy('first')
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file_obj:
+            json.dump({'field_name': 'root', 'first': {'field_name': 'first', 'invalid': True}}, file_obj)
+        self.addCleanup(os.remove, file_obj.name)
+        # Driver.main shuts the executor down, hence it gets a pool of its own
+        executor = ThreadPoolExecutor(max_workers=2)
+
+        with mock.patch.object(self.module, 'json_loads', lambda content: to_layer(json.loads(bytes(content)))), \
+                mock.patch.object(self.module, 'executor', executor), \
+                self.assertRaises(SystemExit) as context:
+            self.module.Driver().main(file_obj.name)
+        self.assertEqual(context.exception.code, 1)
+        self.assertEqual(self.notified, ['root'])
+
+
+class ConfigurationBasedStrategyTest(FailurePathTestMixin, unittest.TestCase):
+    module = configuration_based_strategy
+
+    def patch_resolver(self, resolver):
+        return mock.patch.object(self.module, '_get_strategy', resolver)
+
+
+class OneStrategyPerLayerTypeTest(FailurePathTestMixin, unittest.TestCase):
+    module = one_strategy_per_layer_type
+
+    def patch_resolver(self, resolver):
+        return mock.patch.object(self.module.StrategyResolver, 'get_strategy', resolver)
+
+
+if __name__ == '__main__':
+    unittest.main()
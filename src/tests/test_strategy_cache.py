@@ -0,0 +1,49 @@
+import unittest
+from unittest import mock
+
+from dataprocessor import configuration_based_strategy as module
+
+
+class StubStrategy(object):
+    """
+    Stands in for ConcreteStrategy, whose storage handlers are still abstract in the template
+    """
+
+    def __init__(self, field_name):
+        self.field_name = field_name
+
+
+class StrategyCacheTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(module, 'ConcreteStrategy', StubStrategy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        module._get_shared_strategy.cache_clear()
+        self.addCleanup(module._get_shared_strategy.cache_clear)
+
+    def test_configured_field_names_get_their_own_strategy(self):
+        address_strategy = module._get_strategy('address')
+
+        self.assertEqual(address_strategy.field_name, 'address')
+        self.assertIs(module._get_strategy('address'), address_strategy)
+        self.assertIsNot(module._get_strategy('location'), address_strategy)
+
+    def test_unknown_field_names_share_the_default_strategy(self):
+        default_strategy = module._get_strategy('unknown')
+
+        for index in range(1000):
+            self.assertIs(module._get_strategy(f'unknown-{index}'), default_strategy)
+        self.assertIsNone(default_strategy.field_name)
+        self.assertEqual(module._get_shared_strategy.cache_info().currsize, 1)
+
+    def test_default_strategy_uses_the_factory_defaults(self):
+        self.assertEqual(module._get_handler_classes(None),
+                         (module.TransformerFactory.get_transformer('unknown'),
+                          module.StorageFactory.get_storage('unknown'),
+                          module.NotifierFactory.get_notifier('unknown')))
+        self.assertEqual(module._get_handler_classes(None),
+                         (module.ReflectiveTransformer, module.StoreToFile, module.NullNotifier))
+
+
+if __name__ == '__main__':
+    unittest.main()